@@ -1,9 +1,21 @@
 from datetime import date, timedelta
-from garminconnect import Garmin
 from notion_client import Client
 from dotenv import load_dotenv
 import os
 
+import garmin_auth
+from local_export import get_exporter
+from notion_schema import get_payload_template
+
+# Properties written to the daily steps database, with their expected Notion types
+STEPS_PROPERTIES = {
+    "Activity Type": "title",
+    "Date": "date",
+    "Total Steps": "number",
+    "Step Goal": "number",
+    "Total Distance (km)": "number"
+}
+
 def get_all_daily_steps(garmin):
     """
     Get last x days of daily step count data from Garmin Connect.
@@ -32,37 +44,44 @@ def daily_steps_exist(client, database_id, activity_date):
     results = query['results']
     return results[0] if results else None
 
-def steps_need_update(existing_steps, new_steps):
+def build_steps_values(steps):
+    """
+    Build the plain property values for a day of steps, keyed by Notion property name.
+    """
+    total_distance = steps.get('totalDistance')
+    if total_distance is None:
+        total_distance = 0
+    return {
+        "Activity Type": "Walking",
+        "Date": steps.get('calendarDate'),
+        "Total Steps": steps.get('totalSteps'),
+        "Step Goal": steps.get('stepGoal'),
+        "Total Distance (km)": round(total_distance / 1000, 2)
+    }
+
+def steps_update_values(steps):
+    """
+    Values rewritten on update; the date identifies the page and is left untouched.
+    """
+    values = build_steps_values(steps)
+    del values["Date"]
+    return values
+
+def steps_need_update(client, database_id, existing_steps, new_steps):
     """
     Compare existing steps data with imported data to determine if an update is needed.
     """
-    existing_props = existing_steps['properties']
-    activity_type = "Walking"
-    
-    return (
-        existing_props['Total Steps']['number'] != new_steps.get('totalSteps') or
-        existing_props['Step Goal']['number'] != new_steps.get('stepGoal') or
-        existing_props['Total Distance (km)']['number'] != new_steps.get('totalDistance') or
-        existing_props['Activity Type']['title'] != activity_type
-    )
+    template = get_payload_template(client, database_id, STEPS_PROPERTIES)
+    return template.needs_update(existing_steps['properties'], steps_update_values(new_steps))
 
-def update_daily_steps(client, existing_steps, new_steps):
+def update_daily_steps(client, database_id, existing_steps, new_steps):
     """
     Update an existing daily steps entry in the Notion database with new data.
     """
-    total_distance = new_steps.get('totalDistance')
-    if total_distance is None:
-        total_distance = 0
-    properties = {
-        "Activity Type":  {"title": [{"text": {"content": "Walking"}}]},
-        "Total Steps": {"number": new_steps.get('totalSteps')},
-        "Step Goal": {"number": new_steps.get('stepGoal')},
-        "Total Distance (km)": {"number": round(total_distance / 1000, 2)}
-    }
-    
+    template = get_payload_template(client, database_id, STEPS_PROPERTIES)
     update = {
         "page_id": existing_steps['id'],
-        "properties": properties,
+        "properties": template.fill(steps_update_values(new_steps)),
     }
         
     client.pages.update(**update)
@@ -71,20 +90,10 @@ def create_daily_steps(client, database_id, steps):
     """
     Create a new daily steps entry in the Notion database.
     """
-    total_distance = steps.get('totalDistance')
-    if total_distance is None:
-        total_distance = 0
-    properties = {
-        "Activity Type": {"title": [{"text": {"content": "Walking"}}]},
-        "Date": {"date": {"start": steps.get('calendarDate')}},
-        "Total Steps": {"number": steps.get('totalSteps')},
-        "Step Goal": {"number": steps.get('stepGoal')},
-        "Total Distance (km)": {"number": round(total_distance / 1000, 2)}
-    }
-    
+    template = get_payload_template(client, database_id, STEPS_PROPERTIES)
     page = {
         "parent": {"database_id": database_id},
-        "properties": properties,
+        "properties": template.fill(build_steps_values(steps)),
     }
     
     client.pages.create(**page)
@@ -99,19 +108,20 @@ def main():
     database_id = os.getenv("NOTION_STEPS_DB_ID")
 
     # Initialize Garmin client and login
-    garmin = Garmin(garmin_email, garmin_password)
-    garmin.login()
+    garmin = garmin_auth.login(garmin_email, garmin_password)
     client = Client(auth=notion_token)
 
     daily_steps = get_all_daily_steps(garmin)
-    for steps in daily_steps:
-        steps_date = steps.get('calendarDate')
-        existing_steps = daily_steps_exist(client, database_id, steps_date)
-        if existing_steps:
-            if steps_need_update(existing_steps, steps):
-                update_daily_steps(client, existing_steps, steps)
-        else:
-            create_daily_steps(client, database_id, steps)
+    with get_exporter("daily_steps", "Date", ("Date",)) as exporter:
+        for steps in daily_steps:
+            steps_date = steps.get('calendarDate')
+            existing_steps = daily_steps_exist(client, database_id, steps_date)
+            if existing_steps:
+                if steps_need_update(client, database_id, existing_steps, steps):
+                    update_daily_steps(client, database_id, existing_steps, steps)
+            else:
+                create_daily_steps(client, database_id, steps)
+            exporter.append(build_steps_values(steps))
 
 if __name__ == '__main__':
     main()
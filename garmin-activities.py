@@ -1,11 +1,26 @@
+import json
 import os
-from datetime import datetime, UTC, timedelta
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, datetime, UTC, timedelta
 
 import pytz
 from dotenv import load_dotenv
 from garminconnect import Garmin as GarminClient
 from notion_client import Client as NotionClient
 
+import garmin_auth
+from local_export import DatasetExporter, get_exporter, load_rows
+from notion_batch import DEFAULT_REQUESTS_PER_SECOND, RateLimiter, query_all_pages, retry_rate_limited, update_pages
+from notion_schema import get_payload_template
+from rerender import (
+    FORMATTER_VERSIONS_PROPERTY,
+    format_versions,
+    plan_rerender,
+    stale_pages_filter,
+    truncate_to_minute,
+)
+
 # Your local time zone, replace with the appropriate one if needed
 local_tz = pytz.timezone('America/Toronto')
 
@@ -31,6 +46,43 @@ ACTIVITY_ICONS = {
     # Add more mappings as needed
 }
 
+# Properties written to the activities database, with their expected Notion types
+ACTIVITY_PROPERTIES = {
+    "Date": "date",
+    "Activity Type": "select",
+    "Subactivity Type": "select",
+    "Activity Name": "title",
+    "Distance (km)": "number",
+    "Duration (min)": "number",
+    "Calories": "number",
+    "Avg Pace": "rich_text",
+    "Avg Power": "number",
+    "Max Power": "number",
+    "Training Effect": "select",
+    "Aerobic": "number",
+    "Aerobic Effect": "select",
+    "Anaerobic": "number",
+    "Anaerobic Effect": "select",
+    "PR": "checkbox",
+    "Fav": "checkbox",
+    FORMATTER_VERSIONS_PROPERTY: "rich_text",
+}
+
+# Bump a formatter's version whenever its output changes, then run `python garmin-activities.py rerender` to update
+# only the pages rendered with an older version
+FORMATTER_VERSIONS = {
+    "format_activity_type": 1,
+    "format_training_message": 1,
+    "format_pace": 1,
+}
+
+# Properties whose value depends on each formatter
+FORMATTER_FIELDS = {
+    "format_activity_type": ["Activity Type", "Subactivity Type"],
+    "format_training_message": ["Aerobic Effect", "Anaerobic Effect"],
+    "format_pace": ["Avg Pace"],
+}
+
 
 def get_all_activities(garmin_client: GarminClient, limit: int = 1000) -> list[dict]:
     return garmin_client.get_activities(0, limit)
@@ -146,92 +198,92 @@ def activity_exists(
         }
     )
     results = query['results']
-    return results[0] if results else None
+    if results:
+        return results[0]
 
+    # Pages written before a format_activity_type() change still carry the old type until a re-render, so fall back to
+    # matching on date and name alone rather than creating a duplicate.
+    query = notion_client.databases.query(
+        database_id=database_id,
+        filter={
+            "and": [
+                {"property": "Date", "date": {"on_or_after": lookup_min_date.isoformat()}},
+                {"property": "Date", "date": {"on_or_before": lookup_max_date.isoformat()}},
+                {"property": "Activity Name", "title": {"equals": activity_name}}
+            ]
+        }
+    )
+    results = query['results']
+    return results[0] if results else None
 
-def activity_needs_update(existing_activity: dict, new_activity: dict) -> bool:
-    existing_props = existing_activity['properties']
 
-    activity_name = new_activity.get('activityName', '').lower()
+def build_activity_values(activity: dict) -> dict:
+    # Build the plain property values for an activity, keyed by Notion property name
+    activity_name = format_entertainment(activity.get('activityName', 'Unnamed Activity'))
     activity_type, activity_subtype = format_activity_type(
-        new_activity.get('activityType', {}).get('typeKey', 'Unknown'),
+        activity.get('activityType', {}).get('typeKey', 'Unknown'),
         activity_name
     )
 
-    # Check if 'Subactivity Type' property exists
-    has_subactivity = (
-        'Subactivity Type' in existing_props and
-        existing_props['Subactivity Type'] is not None and
-        existing_props['Subactivity Type'].get('select') is not None
-    )
+    return {
+        "Date": activity.get('startTimeGMT'),
+        "Activity Type": activity_type,
+        "Subactivity Type": activity_subtype,
+        "Activity Name": activity_name,
+        "Distance (km)": round(activity.get('distance', 0) / 1000, 2),
+        "Duration (min)": round(activity.get('duration', 0) / 60, 2),
+        "Calories": round(activity.get('calories', 0)),
+        "Avg Pace": format_pace(activity.get('averageSpeed', 0)),
+        "Avg Power": round(activity.get('avgPower', 0), 1),
+        "Max Power": round(activity.get('maxPower', 0), 1),
+        "Training Effect": format_training_effect(activity.get('trainingEffectLabel', 'Unknown')),
+        "Aerobic": round(activity.get('aerobicTrainingEffect', 0), 1),
+        "Aerobic Effect": format_training_message(activity.get('aerobicTrainingEffectMessage', 'Unknown')),
+        "Anaerobic": round(activity.get('anaerobicTrainingEffect', 0), 1),
+        "Anaerobic Effect": format_training_message(activity.get('anaerobicTrainingEffectMessage', 'Unknown')),
+        "PR": activity.get('pr', False),
+        "Fav": activity.get('favorite', False),
+        FORMATTER_VERSIONS_PROPERTY: format_versions(FORMATTER_VERSIONS),
+    }
 
-    return (
-        existing_props['Distance (km)']['number'] != round(new_activity.get('distance', 0) / 1000, 2) or
-        existing_props['Duration (min)']['number'] != round(new_activity.get('duration', 0) / 60, 2) or
-        existing_props['Calories']['number'] != round(new_activity.get('calories', 0)) or
-        existing_props['Avg Pace']['rich_text'][0]['text']['content'] != format_pace(
-        new_activity.get('averageSpeed', 0)
-    ) or
-        existing_props['Avg Power']['number'] != round(new_activity.get('avgPower', 0), 1) or
-        existing_props['Max Power']['number'] != round(new_activity.get('maxPower', 0), 1) or
-        existing_props['Training Effect']['select']['name'] != format_training_effect(
-        new_activity.get('trainingEffectLabel', 'Unknown')
-    ) or
-        existing_props['Aerobic']['number'] != round(new_activity.get('aerobicTrainingEffect', 0), 1) or
-        existing_props['Aerobic Effect']['select']['name'] != format_training_message(
-        new_activity.get('aerobicTrainingEffectMessage', 'Unknown')
-    ) or
-        existing_props['Anaerobic']['number'] != round(new_activity.get('anaerobicTrainingEffect', 0), 1) or
-        existing_props['Anaerobic Effect']['select']['name'] != format_training_message(
-        new_activity.get('anaerobicTrainingEffectMessage', 'Unknown')
-    ) or
-        existing_props['PR']['checkbox'] != new_activity.get('pr', False) or
-        existing_props['Fav']['checkbox'] != new_activity.get('favorite', False) or
-        existing_props['Activity Type']['select']['name'] != activity_type or
-        (has_subactivity and existing_props['Subactivity Type']['select']['name'] != activity_subtype) or
-        (not has_subactivity)  # If the property doesn't exist, we need an update
-    )
+
+def get_activity_icon(values: dict) -> str | None:
+    activity_type = values["Activity Type"]
+    activity_subtype = values["Subactivity Type"]
+    return ACTIVITY_ICONS.get(activity_subtype if activity_subtype != activity_type else activity_type)
+
+
+def activity_update_values(new_activity: dict) -> dict:
+    # Date and name identify the page, so they are never rewritten on update
+    values = build_activity_values(new_activity)
+    del values["Date"]
+    del values["Activity Name"]
+    return values
+
+
+def activity_needs_update(
+    notion_client: NotionClient,
+    database_id: str,
+    existing_activity: dict,
+    new_activity: dict,
+) -> bool:
+    # Properties missing from the database are left out of the template, so they never force an update. An outdated
+    # formatter version alone doesn't either; that is handled by the rerender command.
+    template = get_payload_template(notion_client, database_id, ACTIVITY_PROPERTIES)
+    values = activity_update_values(new_activity)
+    del values[FORMATTER_VERSIONS_PROPERTY]
+    return template.needs_update(existing_activity['properties'], values)
 
 
 def create_activity(notion_client: NotionClient, database_id: str, activity: dict) -> None:
     # Create a new activity in the Notion database
-    activity_date = activity.get('startTimeGMT')
-    activity_name = format_entertainment(activity.get('activityName', 'Unnamed Activity'))
-    activity_type, activity_subtype = format_activity_type(
-        activity.get('activityType', {}).get('typeKey', 'Unknown'),
-        activity_name
-    )
-
-    # Get icon for the activity type
-    icon_url = ACTIVITY_ICONS.get(activity_subtype if activity_subtype != activity_type else activity_type)
-
-    properties = {
-        "Date": {"date": {"start": activity_date}},
-        "Activity Type": {"select": {"name": activity_type}},
-        "Subactivity Type": {"select": {"name": activity_subtype}},
-        "Activity Name": {"title": [{"text": {"content": activity_name}}]},
-        "Distance (km)": {"number": round(activity.get('distance', 0) / 1000, 2)},
-        "Duration (min)": {"number": round(activity.get('duration', 0) / 60, 2)},
-        "Calories": {"number": round(activity.get('calories', 0))},
-        "Avg Pace": {"rich_text": [{"text": {"content": format_pace(activity.get('averageSpeed', 0))}}]},
-        "Avg Power": {"number": round(activity.get('avgPower', 0), 1)},
-        "Max Power": {"number": round(activity.get('maxPower', 0), 1)},
-        "Training Effect": {"select": {"name": format_training_effect(activity.get('trainingEffectLabel', 'Unknown'))}},
-        "Aerobic": {"number": round(activity.get('aerobicTrainingEffect', 0), 1)},
-        "Aerobic Effect": {
-            "select": {"name": format_training_message(activity.get('aerobicTrainingEffectMessage', 'Unknown'))}
-        },
-        "Anaerobic": {"number": round(activity.get('anaerobicTrainingEffect', 0), 1)},
-        "Anaerobic Effect": {
-            "select": {"name": format_training_message(activity.get('anaerobicTrainingEffectMessage', 'Unknown'))}
-        },
-        "PR": {"checkbox": activity.get('pr', False)},
-        "Fav": {"checkbox": activity.get('favorite', False)}
-    }
+    template = get_payload_template(notion_client, database_id, ACTIVITY_PROPERTIES)
+    values = build_activity_values(activity)
+    icon_url = get_activity_icon(values)
 
     page = {
         "parent": {"database_id": database_id},
-        "properties": properties,
+        "properties": template.fill(values),
     }
 
     if icon_url:
@@ -240,44 +292,20 @@ def create_activity(notion_client: NotionClient, database_id: str, activity: dic
     notion_client.pages.create(**page)
 
 
-def update_activity(notion_client: NotionClient, existing_activity: dict, new_activity: dict) -> None:
+def update_activity(
+    notion_client: NotionClient,
+    database_id: str,
+    existing_activity: dict,
+    new_activity: dict,
+) -> None:
     # Update an existing activity in the Notion database with new data
-    activity_name = new_activity.get('activityName', 'Unnamed Activity')
-    activity_type, activity_subtype = format_activity_type(
-        new_activity.get('activityType', {}).get('typeKey', 'Unknown'),
-        activity_name
-    )
-
-    # Get icon for the activity type
-    icon_url = ACTIVITY_ICONS.get(activity_subtype if activity_subtype != activity_type else activity_type)
-
-    properties = {
-        "Activity Type": {"select": {"name": activity_type}},
-        "Subactivity Type": {"select": {"name": activity_subtype}},
-        "Distance (km)": {"number": round(new_activity.get('distance', 0) / 1000, 2)},
-        "Duration (min)": {"number": round(new_activity.get('duration', 0) / 60, 2)},
-        "Calories": {"number": round(new_activity.get('calories', 0))},
-        "Avg Pace": {"rich_text": [{"text": {"content": format_pace(new_activity.get('averageSpeed', 0))}}]},
-        "Avg Power": {"number": round(new_activity.get('avgPower', 0), 1)},
-        "Max Power": {"number": round(new_activity.get('maxPower', 0), 1)},
-        "Training Effect": {
-            "select": {"name": format_training_effect(new_activity.get('trainingEffectLabel', 'Unknown'))}
-        },
-        "Aerobic": {"number": round(new_activity.get('aerobicTrainingEffect', 0), 1)},
-        "Aerobic Effect": {
-            "select": {"name": format_training_message(new_activity.get('aerobicTrainingEffectMessage', 'Unknown'))}
-        },
-        "Anaerobic": {"number": round(new_activity.get('anaerobicTrainingEffect', 0), 1)},
-        "Anaerobic Effect": {
-            "select": {"name": format_training_message(new_activity.get('anaerobicTrainingEffectMessage', 'Unknown'))}
-        },
-        "PR": {"checkbox": new_activity.get('pr', False)},
-        "Fav": {"checkbox": new_activity.get('favorite', False)}
-    }
+    template = get_payload_template(notion_client, database_id, ACTIVITY_PROPERTIES)
+    values = activity_update_values(new_activity)
+    icon_url = get_activity_icon(values)
 
     update = {
         "page_id": existing_activity['id'],
-        "properties": properties,
+        "properties": template.fill(values),
     }
 
     if icon_url:
@@ -286,6 +314,213 @@ def update_activity(notion_client: NotionClient, existing_activity: dict, new_ac
     notion_client.pages.update(**update)
 
 
+def sync_activity(notion_client: NotionClient, database_id: str, activity: dict) -> None:
+    # Create the activity in Notion, or update the matching page if its data changed
+    activity_date_raw: str = activity.get('startTimeGMT')
+    activity_date: datetime = (
+        datetime
+        .strptime(activity_date_raw, '%Y-%m-%d %H:%M:%S')  # Parse as format received from Garmin
+        .replace(tzinfo=UTC)  # Set timezone to UTC, as Garmin times are in GMT/UTC. Close enough.
+    )
+
+    activity_name = format_entertainment(activity.get('activityName', 'Unnamed Activity'))
+    activity_type, activity_subtype = format_activity_type(
+        activity.get('activityType', {}).get('typeKey', 'Unknown'),
+        activity_name
+    )
+
+    # Check if activity already exists in Notion
+    existing_activity = activity_exists(notion_client, database_id, activity_date, activity_type, activity_name)
+
+    if existing_activity:
+        if activity_needs_update(notion_client, database_id, existing_activity, activity):
+            update_activity(notion_client, database_id, existing_activity, activity)
+            # print(f"Would update: {activity_type} - {activity_name} - {activity_date}")
+    else:
+        create_activity(notion_client, database_id, activity)
+        # print(f"Would create: {activity_type} - {activity_name} - {activity_date}")
+
+
+def get_backfill_partitions(start_date: date, end_date: date, partition_days: int) -> list[tuple[date, date]]:
+    # Split [start_date, end_date] into consecutive, non-overlapping inclusive date ranges
+    partitions = []
+    partition_start = start_date
+    while partition_start <= end_date:
+        partition_end = min(partition_start + timedelta(days=partition_days - 1), end_date)
+        partitions.append((partition_start, partition_end))
+        partition_start = partition_end + timedelta(days=1)
+    return partitions
+
+
+def partition_key(partition: tuple[date, date]) -> str:
+    return f"{partition[0].isoformat()}/{partition[1].isoformat()}"
+
+
+def load_backfill_checkpoint(checkpoint_path: str) -> set[str]:
+    # Return the keys of the partitions already synced by a previous run
+    if not os.path.exists(checkpoint_path):
+        return set()
+    with open(checkpoint_path) as f:
+        return set(json.load(f).get('completed', []))
+
+
+def save_backfill_checkpoint(checkpoint_path: str, completed: set[str]) -> None:
+    # Write to a temporary file first so an interrupted run never leaves a truncated checkpoint behind
+    tmp_path = f"{checkpoint_path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump({'completed': sorted(completed)}, f, indent=2)
+    os.replace(tmp_path, checkpoint_path)
+
+
+def get_activities_for_partition(garmin_client: GarminClient, partition: tuple[date, date]) -> list[dict]:
+    return garmin_client.get_activities_by_date(partition[0].isoformat(), partition[1].isoformat())
+
+
+def backfill(
+    garmin_client: GarminClient,
+    notion_client: NotionClient,
+    database_id: str,
+    start_date: date,
+    end_date: date,
+    partition_days: int = 90,
+    workers: int = 4,
+    checkpoint_path: str = ".garmin-backfill.json",
+    exporter: DatasetExporter | None = None,
+    raw_exporter: DatasetExporter | None = None,
+) -> None:
+    # Import full history by date range. Partitions are fetched concurrently and written to Notion one at a time as
+    # they arrive; each finished partition is checkpointed so a re-run only retries the ranges that failed.
+    # Syncing an activity takes up to two Notion requests (lookup and write), so activities are paced at half the
+    # request rate, and throttled activities are retried so a 429 doesn't fail the whole partition.
+    limiter = RateLimiter(DEFAULT_REQUESTS_PER_SECOND / 2)
+    completed = load_backfill_checkpoint(checkpoint_path)
+    pending = [
+        partition for partition in get_backfill_partitions(start_date, end_date, partition_days)
+        if partition_key(partition) not in completed
+    ]
+    print(f"Backfilling {len(pending)} partitions ({len(completed)} already completed)")
+
+    failed = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(get_activities_for_partition, garmin_client, partition): partition
+            for partition in pending
+        }
+        for future in as_completed(futures):
+            partition = futures[future]
+            key = partition_key(partition)
+            try:
+                activities = future.result()
+                for activity in activities:
+                    limiter.wait()
+                    retry_rate_limited(sync_activity, notion_client, database_id, activity)
+                    if exporter:
+                        exporter.append(build_activity_values(activity))
+                    if raw_exporter:
+                        raw_exporter.append(activity)
+            except Exception as e:
+                print(f"Error backfilling {key}: {e}")
+                failed.append(key)
+                continue
+
+            completed.add(key)
+            save_backfill_checkpoint(checkpoint_path, completed)
+            print(f"Backfilled {key}: {len(activities)} activities")
+
+    if failed:
+        print(f"{len(failed)} partitions failed and will be retried on the next run: {', '.join(sorted(failed))}")
+
+
+def activity_cache_key(activity_date: str, activity_name: str) -> tuple[str, str]:
+    # Match pages to Garmin activities by start minute (UTC) and name, as Notion may truncate the seconds
+    return truncate_to_minute(activity_date), activity_name
+
+
+def fetch_activities_for_dates(
+    garmin_client: GarminClient,
+    dates: set[date],
+    partition_days: int = 30,
+    workers: int = 4,
+) -> list[dict]:
+    # Fetch the activities around the given dates, reusing the backfill partitions and only fetching those that contain
+    # a requested date. Page dates are UTC while Garmin ranges are local, so a day is added on each side.
+    wanted = {day + timedelta(days=offset) for day in dates for offset in (-1, 0, 1)}
+    partitions = [
+        partition for partition in get_backfill_partitions(min(wanted), max(wanted), partition_days)
+        if any(partition[0] <= day <= partition[1] for day in wanted)
+    ]
+
+    activities = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(get_activities_for_partition, garmin_client, partition): partition
+            for partition in partitions
+        }
+        for future in as_completed(futures):
+            try:
+                activities.extend(future.result())
+            except Exception as e:
+                print(f"Error fetching activities for {partition_key(futures[future])}: {e}")
+    return activities
+
+
+def rerender(
+    garmin_client: GarminClient,
+    notion_client: NotionClient,
+    database_id: str,
+    workers: int = 4,
+) -> None:
+    # Re-apply changed formatters to existing pages, patching only the affected fields of the pages whose rendered values
+    # actually change. Garmin data comes from the raw activities cached by the local export when EXPORT_DIR is set;
+    # stale pages not found there are fetched from Garmin by date range.
+    template = get_payload_template(notion_client, database_id, ACTIVITY_PROPERTIES)
+    if FORMATTER_VERSIONS_PROPERTY not in template:
+        raise SystemExit(f"Add a '{FORMATTER_VERSIONS_PROPERTY}' text property to the database to use rerender")
+
+    # Only pages rendered with an outdated formatter are read, not the whole database
+    pages = list(query_all_pages(notion_client, database_id, filter=stale_pages_filter(FORMATTER_VERSIONS)))
+
+    def get_page_key(page: dict) -> tuple[str, str] | None:
+        props = page['properties']
+        page_date = (props['Date'].get('date') or {}).get('start')
+        page_name = "".join(part.get('plain_text', '') for part in props['Activity Name']['title'])
+        return activity_cache_key(page_date, page_name) if page_date else None
+
+    activity_values = {}
+
+    def add_activities(activities) -> None:
+        for activity in activities:
+            values = build_activity_values(activity)
+            activity_values[activity_cache_key(values["Date"], values["Activity Name"])] = values
+
+    add_activities(load_rows("garmin_activities"))
+    missing_dates = {
+        date.fromisoformat(key[0][:10]) for page in pages
+        if (key := get_page_key(page)) and key not in activity_values
+    }
+    if missing_dates:
+        print(f"Fetching Garmin activities for {len(missing_dates)} dates not found in the local cache")
+        add_activities(fetch_activities_for_dates(garmin_client, missing_dates, workers=workers))
+
+    def get_values(page: dict) -> dict | None:
+        key = get_page_key(page)
+        return activity_values.get(key) if key else None
+
+    updates, missing = plan_rerender(pages, template, FORMATTER_VERSIONS, FORMATTER_FIELDS, get_values)
+
+    # A new activity type also means a new icon
+    pages_by_id = {page['id']: page for page in pages}
+    for update in updates:
+        if "Activity Type" in update["properties"] or "Subactivity Type" in update["properties"]:
+            icon_url = get_activity_icon(get_values(pages_by_id[update["page_id"]]))
+            if icon_url:
+                update["icon"] = {"type": "external", "external": {"url": icon_url}}
+
+    print(f"Found {len(pages)} stale pages: {len(updates)} to re-render, {missing} without matching Garmin data")
+    failed = update_pages(notion_client, updates)
+    print(f"Re-rendered {len(updates) - len(failed)} pages, {len(failed)} failed")
+
+
 def main():
     load_dotenv()
 
@@ -297,38 +532,46 @@ def main():
     garmin_fetch_limit = int(os.getenv("GARMIN_ACTIVITIES_FETCH_LIMIT") or "1000")
 
     # Initialize Garmin client and login
-    garmin_client = GarminClient(garmin_email, garmin_password)
-    garmin_client.login()
+    garmin_client = garmin_auth.login(garmin_email, garmin_password)
     notion_client = NotionClient(auth=notion_token)
 
+    if len(sys.argv) > 1 and sys.argv[1] == "rerender":
+        rerender(garmin_client, notion_client, database_id, workers=int(os.getenv("GARMIN_BACKFILL_WORKERS") or "4"))
+        return
+
+    exporter = get_exporter("activities", "Date", ("Date", "Activity Type", "Activity Name"))
+    # Raw Garmin activities, kept so formatter changes can be re-applied later without refetching them
+    raw_exporter = get_exporter("garmin_activities", "startTimeGMT", ("activityId",), parquet=False)
+
+    if len(sys.argv) > 1 and sys.argv[1] == "backfill":
+        backfill_start = os.getenv("GARMIN_BACKFILL_START")
+        if not backfill_start:
+            raise SystemExit("GARMIN_BACKFILL_START must be set (YYYY-MM-DD) to run a backfill")
+
+        with exporter, raw_exporter:
+            backfill(
+                garmin_client,
+                notion_client,
+                database_id,
+                start_date=date.fromisoformat(backfill_start),
+                end_date=date.today(),
+                partition_days=int(os.getenv("GARMIN_BACKFILL_PARTITION_DAYS") or "90"),
+                workers=int(os.getenv("GARMIN_BACKFILL_WORKERS") or "4"),
+                checkpoint_path=os.getenv("GARMIN_BACKFILL_CHECKPOINT") or ".garmin-backfill.json",
+                exporter=exporter,
+                raw_exporter=raw_exporter,
+            )
+        return
+
     # Get all activities
     activities = get_all_activities(garmin_client, garmin_fetch_limit)
 
     # Process all activities
-    for activity in activities:
-        activity_date_raw: str = activity.get('startTimeGMT')
-        activity_date: datetime = (
-            datetime
-            .strptime(activity_date_raw, '%Y-%m-%d %H:%M:%S')  # Parse as format received from Garmin
-            .replace(tzinfo=UTC)  # Set timezone to UTC, as Garmin times are in GMT/UTC. Close enough.
-        )
-
-        activity_name = format_entertainment(activity.get('activityName', 'Unnamed Activity'))
-        activity_type, activity_subtype = format_activity_type(
-            activity.get('activityType', {}).get('typeKey', 'Unknown'),
-            activity_name
-        )
-
-        # Check if activity already exists in Notion
-        existing_activity = activity_exists(notion_client, database_id, activity_date, activity_type, activity_name)
-
-        if existing_activity:
-            if activity_needs_update(existing_activity, activity):
-                update_activity(notion_client, existing_activity, activity)
-                # print(f"Would update: {activity_type} - {activity_name} - {activity_date}")
-        else:
-            create_activity(notion_client, database_id, activity)
-            # print(f"Would create: {activity_type} - {activity_name} - {activity_date}")
+    with exporter, raw_exporter:
+        for activity in activities:
+            sync_activity(notion_client, database_id, activity)
+            exporter.append(build_activity_values(activity))
+            raw_exporter.append(activity)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,91 @@
+import base64
+import hashlib
+import json
+import os
+import tempfile
+from functools import lru_cache
+
+from cryptography.fernet import Fernet, InvalidToken
+from garminconnect import Garmin as GarminClient
+
+DEFAULT_TOKEN_STORE = ".garmin-tokens.json"
+
+
+def _account_key(email: str) -> str:
+    # Accounts are stored under a hash so the token file doesn't reveal which emails it holds
+    return hashlib.sha256(email.lower().encode()).hexdigest()
+
+
+@lru_cache(maxsize=None)
+def _get_configured_fernet(key: str) -> Fernet | None:
+    # Validated once per run; a malformed key must not stop the jobs before they can fall back to another login
+    try:
+        return Fernet(key)
+    except (ValueError, TypeError):
+        print("GARMIN_TOKEN_KEY is not a valid Fernet key, using a key derived from the Garmin credentials instead")
+        return None
+
+
+def _get_fernet(email: str, password: str) -> Fernet:
+    # Use a valid GARMIN_TOKEN_KEY if provided, otherwise derive a per-account key from the Garmin credentials
+    key = os.getenv("GARMIN_TOKEN_KEY")
+    fernet = _get_configured_fernet(key) if key else None
+    if fernet:
+        return fernet
+    derived = hashlib.pbkdf2_hmac("sha256", password.encode(), email.lower().encode(), 200_000)
+    return Fernet(base64.urlsafe_b64encode(derived))
+
+
+def _read_store(store_path: str) -> dict:
+    if not os.path.exists(store_path):
+        return {}
+    try:
+        with open(store_path) as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Ignoring unreadable Garmin token store {store_path}: {e}")
+        return {}
+
+
+def load_tokens(store_path: str, email: str, password: str) -> str | None:
+    encrypted = _read_store(store_path).get(_account_key(email))
+    if not encrypted:
+        return None
+    try:
+        return _get_fernet(email, password).decrypt(encrypted.encode()).decode()
+    except InvalidToken:
+        print("Stored Garmin tokens could not be decrypted, a full login is required")
+        return None
+
+
+def save_tokens(store_path: str, email: str, password: str, tokens: str) -> None:
+    store = _read_store(store_path)
+    store[_account_key(email)] = _get_fernet(email, password).encrypt(tokens.encode()).decode()
+
+    # Write to a unique temporary file first so a reader never sees a truncated store. Writers are not locked against
+    # each other, so the jobs are expected to run one at a time (as in the workflow); otherwise the last write wins.
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(store_path)), suffix=".tmp")
+    with os.fdopen(fd, 'w') as f:
+        json.dump(store, f, indent=2)
+    os.replace(tmp_path, store_path)
+
+
+def login(email: str, password: str) -> GarminClient:
+    # Log in to Garmin, reusing stored OAuth tokens when possible. Expired access tokens are refreshed by the client
+    # on first use; a full SSO login with the password only happens when no usable tokens are stored.
+    store_path = os.getenv("GARMIN_TOKEN_STORE") or DEFAULT_TOKEN_STORE
+
+    tokens = load_tokens(store_path, email, password)
+    if tokens:
+        garmin_client = GarminClient(email, password)
+        try:
+            garmin_client.login(tokens)
+            save_tokens(store_path, email, password, garmin_client.garth.dumps())
+            return garmin_client
+        except Exception as e:
+            print(f"Stored Garmin tokens were rejected, falling back to a full login: {e}")
+
+    garmin_client = GarminClient(email, password)
+    garmin_client.login()
+    save_tokens(store_path, email, password, garmin_client.garth.dumps())
+    return garmin_client
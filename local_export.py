@@ -0,0 +1,95 @@
+import json
+import os
+from typing import Any, Iterator
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet output is optional, JSONL is always written
+    pa = None
+    pq = None
+
+
+class DatasetExporter:
+    """Streams synced rows to local JSONL files partitioned by month, e.g. <export_dir>/activities/2024-05.jsonl."""
+
+    def __init__(
+        self,
+        export_dir: str | None,
+        dataset: str,
+        date_field: str,
+        key_fields: tuple[str, ...],
+        parquet: bool = True,
+    ):
+        self.enabled = bool(export_dir)
+        self.dataset_dir = os.path.join(export_dir, dataset) if export_dir else None
+        self.date_field = date_field
+        self.key_fields = key_fields
+        self.parquet = parquet
+        self._touched_partitions: set[str] = set()
+
+    def __enter__(self) -> "DatasetExporter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.compact()
+
+    def append(self, row: dict[str, Any]) -> None:
+        # Append a single row to its month partition as soon as it is synced
+        if not self.enabled:
+            return
+        row_date = row.get(self.date_field)
+        partition = row_date[:7] if isinstance(row_date, str) and row_date else "unknown"
+
+        os.makedirs(self.dataset_dir, exist_ok=True)
+        with open(self._partition_path(partition, "jsonl"), "a", encoding="utf-8") as f:
+            f.write(json.dumps(row, ensure_ascii=False, default=str) + "\n")
+        self._touched_partitions.add(partition)
+
+    def compact(self) -> None:
+        # Rewrite every partition appended to during this run, keeping only the latest row per key
+        if not self.enabled:
+            return
+        for partition in sorted(self._touched_partitions):
+            jsonl_path = self._partition_path(partition, "jsonl")
+            rows: dict[tuple, dict] = {}
+            with open(jsonl_path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        row = json.loads(line)
+                        rows[tuple(row.get(field) for field in self.key_fields)] = row
+
+            compacted = sorted(rows.values(), key=lambda row: str(row.get(self.date_field)))
+            tmp_path = f"{jsonl_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for row in compacted:
+                    f.write(json.dumps(row, ensure_ascii=False, default=str) + "\n")
+            os.replace(tmp_path, jsonl_path)
+
+            if self.parquet and pq is not None:
+                pq.write_table(pa.Table.from_pylist(compacted), self._partition_path(partition, "parquet"))
+
+        self._touched_partitions.clear()
+
+    def _partition_path(self, partition: str, extension: str) -> str:
+        return os.path.join(self.dataset_dir, f"{partition}.{extension}")
+
+
+def get_exporter(dataset: str, date_field: str, key_fields: tuple[str, ...], parquet: bool = True) -> DatasetExporter:
+    # Exporting is enabled by setting EXPORT_DIR; otherwise the exporter does nothing
+    return DatasetExporter(os.getenv("EXPORT_DIR"), dataset, date_field, key_fields, parquet)
+
+
+def load_rows(dataset: str) -> Iterator[dict[str, Any]]:
+    # Yield every exported row of a dataset, oldest month first
+    export_dir = os.getenv("EXPORT_DIR")
+    dataset_dir = os.path.join(export_dir, dataset) if export_dir else None
+    if not dataset_dir or not os.path.isdir(dataset_dir):
+        return
+    for file_name in sorted(os.listdir(dataset_dir)):
+        if not file_name.endswith(".jsonl"):
+            continue
+        with open(os.path.join(dataset_dir, file_name), encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
@@ -0,0 +1,114 @@
+import os
+import sys
+from itertools import groupby
+
+from dotenv import load_dotenv
+from notion_client import Client as NotionClient
+
+from notion_batch import query_all_pages, update_pages
+from rerender import truncate_to_minute
+
+
+def get_text(prop: dict | None) -> str:
+    if not prop:
+        return ""
+    return "".join(part.get('plain_text', '') for part in prop.get(prop.get('type'), []) or [])
+
+
+def get_select(prop: dict | None) -> str:
+    return ((prop or {}).get('select') or {}).get('name', "")
+
+
+def get_date(prop: dict | None) -> str:
+    return ((prop or {}).get('date') or {}).get('start') or ""
+
+
+def activity_key(page: dict) -> tuple | None:
+    props = page['properties']
+    activity_date = get_date(props.get('Date'))
+    if not activity_date:
+        return None
+    return (
+        truncate_to_minute(activity_date),
+        get_select(props.get('Activity Type')),
+        get_text(props.get('Activity Name')),
+    )
+
+
+def record_key(page: dict) -> tuple | None:
+    props = page['properties']
+    record_date = get_date(props.get('Date'))
+    if not record_date:
+        return None
+    return truncate_to_minute(record_date), get_text(props.get('Record'))
+
+
+def steps_key(page: dict) -> tuple | None:
+    steps_date = get_date(page['properties'].get('Date'))
+    return (steps_date,) if steps_date else None
+
+
+def sleep_key(page: dict) -> tuple | None:
+    sleep_date = get_date(page['properties'].get('Long Date'))
+    return (sleep_date,) if sleep_date else None
+
+
+def keep_order(page: dict) -> tuple:
+    # The page kept from a cluster is the current PR (when the database tracks one), then the oldest page
+    is_pr = (page['properties'].get('PR') or {}).get('checkbox', False)
+    return not is_pr, page['created_time']
+
+
+def find_duplicate_clusters(pages: list[dict], key_func) -> list[tuple[tuple, dict, list[dict]]]:
+    # Sort once by key and merge neighbours, so the whole database is checked in a single linear pass after sorting.
+    # Returns (key, page to keep, pages to archive) for every key shared by more than one page.
+    keyed = [(key, page) for page in pages if (key := key_func(page)) is not None]
+    keyed.sort(key=lambda item: item[0])
+
+    clusters = []
+    for key, group in groupby(keyed, key=lambda item: item[0]):
+        cluster = sorted((page for _, page in group), key=keep_order)
+        if len(cluster) > 1:
+            clusters.append((key, cluster[0], cluster[1:]))
+    return clusters
+
+
+def dedupe_database(notion_client: NotionClient, label: str, database_id: str, key_func, dry_run: bool) -> None:
+    pages = list(query_all_pages(notion_client, database_id))
+    clusters = find_duplicate_clusters(pages, key_func)
+    extras = [page for _, _, duplicates in clusters for page in duplicates]
+
+    print(f"{label}: scanned {len(pages)} pages, found {len(clusters)} duplicate clusters ({len(extras)} extra pages)")
+    for key, kept, duplicates in clusters:
+        print(f"  {' | '.join(str(part) for part in key)}: keeping {kept['id']}, "
+              f"archiving {', '.join(page['id'] for page in duplicates)}")
+
+    if dry_run or not extras:
+        return
+
+    failed = update_pages(notion_client, [{"page_id": page['id'], "archived": True} for page in extras])
+    print(f"{label}: archived {len(extras) - len(failed)} pages, {len(failed)} failed")
+
+
+def main():
+    load_dotenv()
+
+    notion_token = os.getenv("NOTION_TOKEN")
+    dry_run = "--dry-run" in sys.argv[1:]
+
+    notion_client = NotionClient(auth=notion_token)
+
+    databases = [
+        ("Activities", os.getenv("NOTION_DB_ID"), activity_key),
+        ("Personal Records", os.getenv("NOTION_PR_DB_ID"), record_key),
+        ("Daily Steps", os.getenv("NOTION_STEPS_DB_ID"), steps_key),
+        ("Sleep", os.getenv("NOTION_SLEEP_DB_ID"), sleep_key),
+    ]
+
+    for label, database_id, key_func in databases:
+        if database_id:
+            dedupe_database(notion_client, label, database_id, key_func, dry_run)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+import time
+from typing import Any, Callable, Iterator
+
+from notion_client import APIErrorCode, APIResponseError
+from notion_client import Client as NotionClient
+
+# Notion allows an average of three requests per second per integration
+DEFAULT_REQUESTS_PER_SECOND = 3.0
+
+# Number of times a rate-limited (HTTP 429) call is retried, with exponential backoff starting at one second
+DEFAULT_RATE_LIMIT_RETRIES = 5
+
+
+class RateLimiter:
+    """Spaces calls so that no more than `requests_per_second` are made on average."""
+
+    def __init__(self, requests_per_second: float = DEFAULT_REQUESTS_PER_SECOND):
+        self.interval = 1 / requests_per_second
+        self._next_call = 0.0
+
+    def wait(self) -> None:
+        now = time.monotonic()
+        if now < self._next_call:
+            time.sleep(self._next_call - now)
+            now = self._next_call
+        self._next_call = now + self.interval
+
+
+def retry_rate_limited(func: Callable[..., Any], *args, retries: int = DEFAULT_RATE_LIMIT_RETRIES, **kwargs) -> Any:
+    # Call func, retrying with exponential backoff while Notion answers 429. Any other error is raised immediately.
+    for attempt in range(retries + 1):
+        try:
+            return func(*args, **kwargs)
+        except APIResponseError as e:
+            if e.code != APIErrorCode.RateLimited or attempt == retries:
+                raise
+            delay = 2 ** attempt
+            print(f"Rate limited by Notion, retrying in {delay}s")
+            time.sleep(delay)
+
+
+def query_all_pages(notion_client: NotionClient, database_id: str, **query) -> Iterator[dict]:
+    # Yield every page of a database, following Notion's pagination cursor (100 pages per request)
+    start_cursor = None
+    while True:
+        if start_cursor:
+            query["start_cursor"] = start_cursor
+        response = notion_client.databases.query(database_id=database_id, page_size=100, **query)
+        yield from response['results']
+        if not response.get('has_more'):
+            return
+        start_cursor = response['next_cursor']
+
+
+def update_pages(
+    notion_client: NotionClient,
+    updates: list[dict],
+    batch_size: int = 50,
+    requests_per_second: float = DEFAULT_REQUESTS_PER_SECOND,
+) -> list[dict]:
+    # Send `pages.update` calls (each a dict of keyword arguments, including page_id) under the rate limit, reporting
+    # progress after each batch. Failed updates are returned rather than raised so one bad page doesn't stop the run.
+    limiter = RateLimiter(requests_per_second)
+    failed = []
+    for start in range(0, len(updates), batch_size):
+        batch = updates[start:start + batch_size]
+        for update in batch:
+            limiter.wait()
+            try:
+                retry_rate_limited(notion_client.pages.update, **update)
+            except Exception as e:
+                print(f"Error updating page {update['page_id']}: {e}")
+                failed.append(update)
+        print(f"Updated {min(start + batch_size, len(updates))}/{len(updates)} pages")
+    return failed
@@ -0,0 +1,103 @@
+import os
+import time
+from typing import Any, Callable
+
+from notion_client import Client as NotionClient
+
+# How long (in seconds) a retrieved database schema is trusted before it is fetched again
+DEFAULT_SCHEMA_CACHE_TTL = 3600
+
+# Converts a plain Python value into the Notion property value for each supported property type
+PROPERTY_BUILDERS: dict[str, Callable[[Any], dict]] = {
+    "title": lambda value: {"title": [{"text": {"content": value}}] if value else []},
+    "rich_text": lambda value: {"rich_text": [{"text": {"content": value}}] if value else []},
+    "number": lambda value: {"number": value},
+    "select": lambda value: {"select": {"name": value} if value else None},
+    "checkbox": lambda value: {"checkbox": bool(value)},
+    "date": lambda value: {"date": value if isinstance(value, dict) or value is None else {"start": value}},
+}
+
+# Reads the plain Python value back out of a Notion page property, used to detect changes
+PROPERTY_READERS: dict[str, Callable[[dict], Any]] = {
+    "title": lambda prop: "".join(
+        part.get('plain_text', part.get('text', {}).get('content', '')) for part in prop.get('title') or []
+    ),
+    "rich_text": lambda prop: "".join(
+        part.get('plain_text', part.get('text', {}).get('content', '')) for part in prop.get('rich_text') or []
+    ),
+    "number": lambda prop: prop.get('number'),
+    "select": lambda prop: (prop.get('select') or {}).get('name'),
+    "checkbox": lambda prop: prop.get('checkbox'),
+}
+
+_schema_cache: dict[str, tuple[float, dict[str, str]]] = {}
+_template_cache: dict[tuple[str, tuple], "PayloadTemplate"] = {}
+
+
+class PayloadTemplate:
+    """Property builders for one database, restricted to the properties that database actually has."""
+
+    def __init__(self, builders: dict[str, Callable[[Any], dict]], readers: dict[str, Callable[[dict], Any]]):
+        self._builders = builders
+        self._readers = readers
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._builders
+
+    def fill(self, values: dict[str, Any]) -> dict:
+        # Build the Notion properties payload, silently dropping properties the database doesn't have
+        return {name: self._builders[name](value) for name, value in values.items() if name in self._builders}
+
+    def needs_update(self, existing_properties: dict, values: dict[str, Any]) -> bool:
+        # Compare the page against the new values. Date properties are used as lookup keys and are not compared.
+        for name, value in values.items():
+            reader = self._readers.get(name)
+            if reader is None:
+                continue
+            existing = existing_properties.get(name)
+            if existing is None or reader(existing) != value:
+                return True
+        return False
+
+
+def get_database_schema(notion_client: NotionClient, database_id: str) -> dict[str, str]:
+    # Return a mapping of property name to property type, retrieving it at most once per TTL window
+    ttl = int(os.getenv("NOTION_SCHEMA_CACHE_TTL") or DEFAULT_SCHEMA_CACHE_TTL)
+    cached = _schema_cache.get(database_id)
+    if cached and time.monotonic() - cached[0] < ttl:
+        return cached[1]
+
+    database = notion_client.databases.retrieve(database_id=database_id)
+    schema = {name: prop['type'] for name, prop in database['properties'].items()}
+    _schema_cache[database_id] = (time.monotonic(), schema)
+    # A fresh schema invalidates every template compiled from the previous one
+    for key in [key for key in _template_cache if key[0] == database_id]:
+        del _template_cache[key]
+    return schema
+
+
+def get_payload_template(notion_client: NotionClient, database_id: str, fields: dict[str, str]) -> PayloadTemplate:
+    # Compile (or reuse) a template for the fields this script writes, keeping only those present with a matching type
+    schema = get_database_schema(notion_client, database_id)
+    key = (database_id, tuple(fields.items()))
+    template = _template_cache.get(key)
+    if template is not None:
+        return template
+
+    builders = {}
+    readers = {}
+    for name, property_type in fields.items():
+        actual_type = schema.get(name)
+        if actual_type is None:
+            print(f"Skipping property '{name}': not found in database {database_id}")
+            continue
+        if actual_type != property_type:
+            print(f"Skipping property '{name}': expected type '{property_type}', found '{actual_type}'")
+            continue
+        builders[name] = PROPERTY_BUILDERS[property_type]
+        if property_type in PROPERTY_READERS:
+            readers[name] = PROPERTY_READERS[property_type]
+
+    template = PayloadTemplate(builders, readers)
+    _template_cache[key] = template
+    return template
@@ -1,7 +1,35 @@
 from datetime import date, datetime
-from garminconnect import Garmin
 from notion_client import Client
 import os
+import sys
+
+import garmin_auth
+from local_export import get_exporter
+from notion_batch import query_all_pages, update_pages
+from notion_schema import get_payload_template
+from rerender import FORMATTER_VERSIONS_PROPERTY, format_versions, plan_rerender, stale_pages_filter, truncate_to_minute
+
+# Properties written to the personal records database, with their expected Notion types
+RECORD_PROPERTIES = {
+    "Date": "date",
+    "Activity Type": "select",
+    "Record": "title",
+    "typeId": "number",
+    "PR": "checkbox",
+    "Value": "rich_text",
+    "Pace": "rich_text",
+    FORMATTER_VERSIONS_PROPERTY: "rich_text"
+}
+
+# Bump a formatter's version whenever its output changes, then run `python personal-records.py rerender`
+FORMATTER_VERSIONS = {
+    "format_garmin_value": 1
+}
+
+# Properties whose value depends on each formatter
+FORMATTER_FIELDS = {
+    "format_garmin_value": ["Value", "Pace"]
+}
 
 def get_icon_for_record(activity_name):
     icon_map = {
@@ -180,17 +208,20 @@ def get_record_by_date_and_name(client, database_id, activity_date, activity_nam
     )
     return query['results'][0] if query['results'] else None
 
-def update_record(client, page_id, activity_date, value, pace, activity_name, is_pr=True):
-    properties = {
-        "Date": {"date": {"start": activity_date}},
-        "PR": {"checkbox": is_pr}
+def update_record(client, database_id, page_id, activity_date, value, pace, activity_name, is_pr=True):
+    values = {
+        "Date": activity_date,
+        "PR": is_pr
     }
     
     if value:
-        properties["Value"] = {"rich_text": [{"text": {"content": value}}]}
+        values["Value"] = value
+        values[FORMATTER_VERSIONS_PROPERTY] = format_versions(FORMATTER_VERSIONS)
     
     if pace:
-        properties["Pace"] = {"rich_text": [{"text": {"content": pace}}]}
+        values["Pace"] = pace
+
+    properties = get_payload_template(client, database_id, RECORD_PROPERTIES).fill(values)
 
     icon = get_icon_for_record(activity_name)
     cover = get_cover_for_record(activity_name)
@@ -207,19 +238,22 @@ def update_record(client, page_id, activity_date, value, pace, activity_name, is
         print(f"Error updating record: {e}")
 
 def write_new_record(client, database_id, activity_date, activity_type, activity_name, typeId, value, pace):
-    properties = {
-        "Date": {"date": {"start": activity_date}},
-        "Activity Type": {"select": {"name": activity_type}},
-        "Record": {"title": [{"text": {"content": activity_name}}]},
-        "typeId": {"number": typeId},
-        "PR": {"checkbox": True}
+    values = {
+        "Date": activity_date,
+        "Activity Type": activity_type,
+        "Record": activity_name,
+        "typeId": typeId,
+        "PR": True,
+        FORMATTER_VERSIONS_PROPERTY: format_versions(FORMATTER_VERSIONS)
     }
     
     if value:
-        properties["Value"] = {"rich_text": [{"text": {"content": value}}]}
+        values["Value"] = value
     
     if pace:
-        properties["Pace"] = {"rich_text": [{"text": {"content": pace}}]}
+        values["Pace"] = pace
+
+    properties = get_payload_template(client, database_id, RECORD_PROPERTIES).fill(values)
     
     icon = get_icon_for_record(activity_name)
     cover = get_cover_for_record(activity_name)
@@ -234,60 +268,107 @@ def write_new_record(client, database_id, activity_date, activity_type, activity
     except Exception as e:
         print(f"Error writing new record: {e}")
 
+def rerender(client, database_id, records):
+    """
+    Re-apply a changed format_garmin_value() to existing record pages, patching only Value and Pace on the pages
+    whose rendered values actually change. Garmin returns every current record in one call, so that list is the cache.
+    Only current PR pages are re-rendered; archived records no longer appear in Garmin's list.
+    """
+    template = get_payload_template(client, database_id, RECORD_PROPERTIES)
+    if FORMATTER_VERSIONS_PROPERTY not in template:
+        print(f"Add a '{FORMATTER_VERSIONS_PROPERTY}' text property to the database to use rerender")
+        return
+
+    rendered = {}
+    for record in records:
+        activity_date = record.get('prStartTimeGmtFormatted')
+        activity_type = format_activity_type(record.get('activityType'))
+        typeId = record.get('typeId', 0)
+        value, pace = format_garmin_value(record.get('value', 0), activity_type, typeId)
+        # Notion normalises and may truncate the page date, so both sides are compared at UTC-minute precision
+        key = (replace_activity_name_by_typeId(typeId), truncate_to_minute(activity_date))
+        rendered[key] = {"Value": value, "Pace": pace}
+
+    def get_values(page):
+        props = page['properties']
+        name = "".join(part.get('plain_text', '') for part in props['Record']['title'])
+        record_date = (props['Date'].get('date') or {}).get('start')
+        return rendered.get((name, truncate_to_minute(record_date))) if record_date else None
+
+    # Only current PR pages rendered with an outdated formatter are read, not the whole database
+    stale_filter = {"and": [stale_pages_filter(FORMATTER_VERSIONS), {"property": "PR", "checkbox": {"equals": True}}]}
+    pages = list(query_all_pages(client, database_id, filter=stale_filter))
+    updates, missing = plan_rerender(pages, template, FORMATTER_VERSIONS, FORMATTER_FIELDS, get_values)
+    print(f"Found {len(pages)} stale pages: {len(updates)} to re-render, {missing} without a current Garmin record")
+    failed = update_pages(client, updates)
+    print(f"Re-rendered {len(updates) - len(failed)} pages, {len(failed)} failed")
+
 def main():
     garmin_email = os.getenv("GARMIN_EMAIL")
     garmin_password = os.getenv("GARMIN_PASSWORD")
     notion_token = os.getenv("NOTION_TOKEN")
     database_id = os.getenv("NOTION_PR_DB_ID")
 
-    garmin = Garmin(garmin_email, garmin_password)
-    garmin.login()
+    garmin = garmin_auth.login(garmin_email, garmin_password)
 
     client = Client(auth=notion_token)
 
     records = garmin.get_personal_record()
     filtered_records = [record for record in records if record.get('typeId') != 16]
 
-    for record in filtered_records:
-        activity_date = record.get('prStartTimeGmtFormatted')
-        activity_type = format_activity_type(record.get('activityType'))
-        activity_name = replace_activity_name_by_typeId(record.get('typeId'))
-        typeId = record.get('typeId', 0)
-        value, pace = format_garmin_value(record.get('value', 0), activity_type, typeId)
+    if len(sys.argv) > 1 and sys.argv[1] == "rerender":
+        rerender(client, database_id, filtered_records)
+        return
+
+    with get_exporter("personal_records", "Date", ("Record", "Date")) as exporter:
+        for record in filtered_records:
+            activity_date = record.get('prStartTimeGmtFormatted')
+            activity_type = format_activity_type(record.get('activityType'))
+            activity_name = replace_activity_name_by_typeId(record.get('typeId'))
+            typeId = record.get('typeId', 0)
+            value, pace = format_garmin_value(record.get('value', 0), activity_type, typeId)
+            exporter.append({
+                "Date": activity_date,
+                "Activity Type": activity_type,
+                "Record": activity_name,
+                "typeId": typeId,
+                "Value": value,
+                "Pace": pace
+            })
 
-        existing_pr_record = get_existing_record(client, database_id, activity_name)
-        existing_date_record = get_record_by_date_and_name(client, database_id, activity_date, activity_name)
-
-        if existing_date_record:
-            update_record(client, existing_date_record['id'], activity_date, value, pace, activity_name, True)
-            print(f"Updated existing record: {activity_type} - {activity_name}")
-        elif existing_pr_record:
-            # Add error handling here
-            try:
-                date_prop = existing_pr_record['properties']['Date']
-                if date_prop and date_prop.get('date') and date_prop['date'].get('start'):
-                    existing_date = date_prop['date']['start']
+            existing_pr_record = get_existing_record(client, database_id, activity_name)
+            existing_date_record = get_record_by_date_and_name(client, database_id, activity_date, activity_name)
+
+            if existing_date_record:
+                update_record(client, database_id, existing_date_record['id'], activity_date, value, pace, activity_name, True)
+                print(f"Updated existing record: {activity_type} - {activity_name}")
+            elif existing_pr_record:
+                # Add error handling here
+                try:
+                    date_prop = existing_pr_record['properties']['Date']
+                    if date_prop and date_prop.get('date') and date_prop['date'].get('start'):
+                        existing_date = date_prop['date']['start']
                     
-                    if activity_date > existing_date:
-                        update_record(client, existing_pr_record['id'], existing_date, None, None, activity_name, False)
-                        print(f"Archived old record: {activity_type} - {activity_name}")
+                        if activity_date > existing_date:
+                            update_record(client, database_id, existing_pr_record['id'], existing_date, None, None, activity_name, False)
+                            print(f"Archived old record: {activity_type} - {activity_name}")
                         
-                        write_new_record(client, database_id, activity_date, activity_type, activity_name, typeId, value, pace)
-                        print(f"Created new PR record: {activity_type} - {activity_name}")
+                            write_new_record(client, database_id, activity_date, activity_type, activity_name, typeId, value, pace)
+                            print(f"Created new PR record: {activity_type} - {activity_name}")
+                        else:
+                            print(f"No update needed: {activity_type} - {activity_name}")
                     else:
-                        print(f"No update needed: {activity_type} - {activity_name}")
-                else:
-                    # Handle case where date is missing or improperly formatted
-                    print(f"Warning: Record {activity_name} has invalid date format - updating anyway")
-                    update_record(client, existing_pr_record['id'], activity_date, value, pace, activity_name, True)
-            except (KeyError, TypeError) as e:
-                print(f"Error processing record {activity_name}: {e}")
-                print(f"Record data: {existing_pr_record['properties']}")
-                # Fallback - create new record if we can't process the existing one properly
+                        # Handle case where date is missing or improperly formatted
+                        print(f"Warning: Record {activity_name} has invalid date format - updating anyway")
+                        update_record(client, database_id, existing_pr_record['id'], activity_date, value, pace, activity_name, True)
+                except (KeyError, TypeError) as e:
+                    print(f"Error processing record {activity_name}: {e}")
+                    print(f"Record data: {existing_pr_record['properties']}")
+                    # Fallback - create new record if we can't process the existing one properly
+                    write_new_record(client, database_id, activity_date, activity_type, activity_name, typeId, value, pace)
+            else:
                 write_new_record(client, database_id, activity_date, activity_type, activity_name, typeId, value, pace)
-        else:
-            write_new_record(client, database_id, activity_date, activity_type, activity_name, typeId, value, pace)
-            print(f"Successfully written new record: {activity_type} - {activity_name}")
+                print(f"Successfully written new record: {activity_type} - {activity_name}")
 
 if __name__ == '__main__':
     main()
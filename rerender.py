@@ -0,0 +1,90 @@
+from datetime import datetime, UTC
+from typing import Any, Callable
+
+from notion_schema import PROPERTY_READERS, PayloadTemplate
+
+# Rich text property recording which formatter versions a page was rendered with, e.g. ";format_pace=1;format_...;"
+FORMATTER_VERSIONS_PROPERTY = "Formatter Versions"
+
+
+def truncate_to_minute(date_str: str) -> str:
+    # Normalise a Garmin or Notion datetime to its UTC minute, as Notion has been observed to truncate datetimes to the
+    # minute. Naive datetimes are treated as UTC; dates without a time component are returned unchanged.
+    if not date_str or len(date_str) <= 10:
+        return date_str
+    parsed = datetime.fromisoformat(date_str)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=UTC)
+    return parsed.astimezone(UTC).strftime('%Y-%m-%dT%H:%M')
+
+
+def format_versions(versions: dict[str, int]) -> str:
+    # Every entry is wrapped in ';' so a filter on ";name=version;" can't match a prefix such as "name=10"
+    return ";" + "".join(f"{name}={version};" for name, version in sorted(versions.items()))
+
+
+def version_tag(name: str, version: int) -> str:
+    return f";{name}={version};"
+
+
+def stale_pages_filter(current_versions: dict[str, int]) -> dict:
+    # Notion query filter returning only pages missing the current version of at least one formatter
+    return {
+        "or": [
+            {"property": FORMATTER_VERSIONS_PROPERTY, "rich_text": {"is_empty": True}},
+            *(
+                {"property": FORMATTER_VERSIONS_PROPERTY, "rich_text": {"does_not_contain": version_tag(name, version)}}
+                for name, version in sorted(current_versions.items())
+            ),
+        ]
+    }
+
+
+def parse_versions(text: str) -> dict[str, int]:
+    versions = {}
+    for part in text.split(";"):
+        name, _, version = part.partition("=")
+        if name and version.isdigit():
+            versions[name] = int(version)
+    return versions
+
+
+def get_stale_formatters(page: dict, current_versions: dict[str, int]) -> set[str]:
+    # Formatters whose version differs from the one recorded on the page; pages without a record are fully stale
+    prop = page['properties'].get(FORMATTER_VERSIONS_PROPERTY)
+    page_versions = parse_versions(PROPERTY_READERS["rich_text"](prop)) if prop else {}
+    return {name for name, version in current_versions.items() if page_versions.get(name) != version}
+
+
+def plan_rerender(
+    pages: list[dict],
+    template: PayloadTemplate,
+    current_versions: dict[str, int],
+    formatter_fields: dict[str, list[str]],
+    get_values: Callable[[dict], dict[str, Any] | None],
+) -> tuple[list[dict], int]:
+    # Build minimal `pages.update` arguments for pages rendered with an outdated formatter. Only the fields that depend
+    # on a stale formatter are recomputed and only changed fields are written; a page whose values are unchanged still
+    # gets its versions stamped so it drops out of the stale filter on the next run.
+    # `get_values` returns the freshly rendered values for a page, or None when no cached Garmin data matches it.
+    # Returns the updates and the number of stale pages that had no cached data.
+    updates = []
+    missing = 0
+    for page in pages:
+        stale = get_stale_formatters(page, current_versions)
+        if not stale:
+            continue
+
+        values = get_values(page)
+        if values is None:
+            missing += 1
+            continue
+
+        fields = {field for name in stale for field in formatter_fields[name]}
+        patch = {field: values[field] for field in fields if field in values}
+        if not template.needs_update(page['properties'], patch):
+            patch = {}
+
+        patch[FORMATTER_VERSIONS_PROPERTY] = format_versions(current_versions)
+        updates.append({"page_id": page['id'], "properties": template.fill(patch)})
+    return updates, missing
@@ -1,20 +1,55 @@
-from datetime import datetime
-from garminconnect import Garmin
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
 from notion_client import Client
 from dotenv import load_dotenv, dotenv_values
+import numpy as np
 import pytz
 import os
+import sys
+
+import garmin_auth
+from local_export import get_exporter
+from notion_batch import DEFAULT_REQUESTS_PER_SECOND, RateLimiter, retry_rate_limited
+from notion_schema import get_payload_template
 
 # Constants
 local_tz = pytz.timezone("America/New_York")
 
+# Properties written to the sleep database, with their expected Notion types
+SLEEP_PROPERTIES = {
+    "Date": "title",
+    "Times": "rich_text",
+    "Long Date": "date",
+    "Full Date/Time": "date",
+    "Total Sleep (h)": "number",
+    "Light Sleep (h)": "number",
+    "Deep Sleep (h)": "number",
+    "REM Sleep (h)": "number",
+    "Awake Time (h)": "number",
+    "Total Sleep": "rich_text",
+    "Light Sleep": "rich_text",
+    "Deep Sleep": "rich_text",
+    "REM Sleep": "rich_text",
+    "Awake Time": "rich_text",
+    "Resting HR": "number",
+    "Sleep Efficiency (%)": "number",
+    "Sleep Latency (min)": "number",
+    "WASO (min)": "number",
+    "Awakenings": "number",
+    "Longest Deep Bout (min)": "number",
+    "Longest REM Bout (min)": "number"
+}
+
+# activityLevel values used by Garmin in the sleepLevels series
+DEEP, LIGHT, REM, AWAKE = 0, 1, 2, 3
+
 # Load environment variables
 load_dotenv()
 CONFIG = dotenv_values()
 
-def get_sleep_data(garmin):
-    today = datetime.today().date()
-    return garmin.get_sleep_data(today.isoformat())
+def get_sleep_data(garmin, day=None):
+    day = day or datetime.today().date()
+    return garmin.get_sleep_data(day.isoformat())
 
 def format_duration(seconds):
     minutes = (seconds or 0) // 60
@@ -32,6 +67,66 @@ def format_time_readable(timestamp):
         if timestamp else "Unknown"
     )
 
+def to_datetime64(series, key):
+    return np.array([entry[key] for entry in series], dtype="datetime64[ms]")
+
+def compute_sleep_stage_metrics(sleep_data):
+    """
+    Derive per-night metrics from the sleepLevels (and sleepMovement) series returned by get_sleep_data(),
+    using array operations only so long backfills stay fast. Returns an empty dict when there is no series.
+
+    These are our own estimates, not values reported by Garmin. In particular, time in bed is taken as the window
+    covered by both series (movement is usually recorded from before sleep onset), which is a heuristic, so sleep
+    efficiency and sleep latency depend on it.
+    """
+    levels_series = sleep_data.get('sleepLevels') or []
+    if not levels_series:
+        return {}
+
+    starts = to_datetime64(levels_series, 'startGMT')
+    ends = to_datetime64(levels_series, 'endGMT')
+    levels = np.array([entry.get('activityLevel') for entry in levels_series], dtype=float).round()
+    order = np.argsort(starts)
+    starts, ends, levels = starts[order], ends[order], levels[order]
+    durations = (ends - starts) / np.timedelta64(1, 's')
+
+    # Time in bed spans both series; movement is usually recorded from before sleep onset
+    movement_series = sleep_data.get('sleepMovement') or []
+    bed_start, bed_end = starts[0], ends.max()
+    if movement_series:
+        bed_start = min(bed_start, to_datetime64(movement_series, 'startGMT').min())
+        bed_end = max(bed_end, to_datetime64(movement_series, 'endGMT').max())
+    time_in_bed = (bed_end - bed_start) / np.timedelta64(1, 's')
+
+    asleep = levels != AWAKE
+    if not asleep.any():
+        return {}
+    onset = np.argmax(asleep)
+    final_wake = len(asleep) - np.argmax(asleep[::-1])  # index just after the last asleep segment
+
+    # Merge consecutive segments of the same stage into bouts
+    new_bout = np.empty(len(levels), dtype=bool)
+    new_bout[0] = True
+    new_bout[1:] = (levels[1:] != levels[:-1]) | (starts[1:] != ends[:-1])
+    bout_ids = np.cumsum(new_bout) - 1
+    bout_durations = np.bincount(bout_ids, weights=durations)
+    bout_levels = levels[new_bout]
+    bout_starts = np.flatnonzero(new_bout)
+
+    # Awake bouts strictly between sleep onset and the final awakening
+    inner_awake = (bout_levels == AWAKE) & (bout_starts > onset) & (bout_starts < final_wake)
+    deep_bouts = bout_durations[bout_levels == DEEP]
+    rem_bouts = bout_durations[bout_levels == REM]
+
+    return {
+        "Sleep Efficiency (%)": round(float(durations[asleep].sum() / time_in_bed * 100), 1) if time_in_bed > 0 else None,
+        "Sleep Latency (min)": round(float((starts[onset] - bed_start) / np.timedelta64(1, 's') / 60), 1),
+        "WASO (min)": round(float(bout_durations[inner_awake].sum() / 60), 1),
+        "Awakenings": int(inner_awake.sum()),
+        "Longest Deep Bout (min)": round(float(deep_bouts.max() / 60), 1) if deep_bouts.size else 0,
+        "Longest REM Bout (min)": round(float(rem_bouts.max() / 60), 1) if rem_bouts.size else 0
+    }
+
 def format_date_for_name(sleep_date):
     return datetime.strptime(sleep_date, "%Y-%m-%d").strftime("%d.%m.%Y") if sleep_date else "Unknown"
 
@@ -43,6 +138,33 @@ def sleep_data_exists(client, database_id, sleep_date):
     results = query.get('results', [])
     return results[0] if results else None  # Ensure it returns None instead of causing IndexError
 
+def build_sleep_values(sleep_data):
+    daily_sleep = sleep_data.get('dailySleepDTO', {})
+    sleep_date = daily_sleep.get('calendarDate', "Unknown Date")
+    total_sleep = sum(
+        (daily_sleep.get(k, 0) or 0) for k in ['deepSleepSeconds', 'lightSleepSeconds', 'remSleepSeconds']
+    )
+
+    values = {
+        "Date": format_date_for_name(sleep_date),
+        "Times": f"{format_time_readable(daily_sleep.get('sleepStartTimestampGMT'))} → {format_time_readable(daily_sleep.get('sleepEndTimestampGMT'))}",
+        "Long Date": sleep_date,
+        "Full Date/Time": {"start": format_time(daily_sleep.get('sleepStartTimestampGMT')), "end": format_time(daily_sleep.get('sleepEndTimestampGMT'))},
+        "Total Sleep (h)": round(total_sleep / 3600, 1),
+        "Light Sleep (h)": round(daily_sleep.get('lightSleepSeconds', 0) / 3600, 1),
+        "Deep Sleep (h)": round(daily_sleep.get('deepSleepSeconds', 0) / 3600, 1),
+        "REM Sleep (h)": round(daily_sleep.get('remSleepSeconds', 0) / 3600, 1),
+        "Awake Time (h)": round(daily_sleep.get('awakeSleepSeconds', 0) / 3600, 1),
+        "Total Sleep": format_duration(total_sleep),
+        "Light Sleep": format_duration(daily_sleep.get('lightSleepSeconds', 0)),
+        "Deep Sleep": format_duration(daily_sleep.get('deepSleepSeconds', 0)),
+        "REM Sleep": format_duration(daily_sleep.get('remSleepSeconds', 0)),
+        "Awake Time": format_duration(daily_sleep.get('awakeSleepSeconds', 0)),
+        "Resting HR": sleep_data.get('restingHeartRate', 0)
+    }
+    values.update(compute_sleep_stage_metrics(sleep_data))
+    return values
+
 def create_sleep_data(client, database_id, sleep_data, skip_zero_sleep=True):
     daily_sleep = sleep_data.get('dailySleepDTO', {})
     if not daily_sleep:
@@ -58,26 +180,65 @@ def create_sleep_data(client, database_id, sleep_data, skip_zero_sleep=True):
         print(f"Skipping sleep data for {sleep_date} as total sleep is 0")
         return
 
-    properties = {
-        "Date": {"title": [{"text": {"content": format_date_for_name(sleep_date)}}]},
-        "Times": {"rich_text": [{"text": {"content": f"{format_time_readable(daily_sleep.get('sleepStartTimestampGMT'))} → {format_time_readable(daily_sleep.get('sleepEndTimestampGMT'))}"}}]},
-        "Long Date": {"date": {"start": sleep_date}},
-        "Full Date/Time": {"date": {"start": format_time(daily_sleep.get('sleepStartTimestampGMT')), "end": format_time(daily_sleep.get('sleepEndTimestampGMT'))}},
-        "Total Sleep (h)": {"number": round(total_sleep / 3600, 1)},
-        "Light Sleep (h)": {"number": round(daily_sleep.get('lightSleepSeconds', 0) / 3600, 1)},
-        "Deep Sleep (h)": {"number": round(daily_sleep.get('deepSleepSeconds', 0) / 3600, 1)},
-        "REM Sleep (h)": {"number": round(daily_sleep.get('remSleepSeconds', 0) / 3600, 1)},
-        "Awake Time (h)": {"number": round(daily_sleep.get('awakeSleepSeconds', 0) / 3600, 1)},
-        "Total Sleep": {"rich_text": [{"text": {"content": format_duration(total_sleep)}}]},
-        "Light Sleep": {"rich_text": [{"text": {"content": format_duration(daily_sleep.get('lightSleepSeconds', 0))}}]},
-        "Deep Sleep": {"rich_text": [{"text": {"content": format_duration(daily_sleep.get('deepSleepSeconds', 0))}}]},
-        "REM Sleep": {"rich_text": [{"text": {"content": format_duration(daily_sleep.get('remSleepSeconds', 0))}}]},
-        "Awake Time": {"rich_text": [{"text": {"content": format_duration(daily_sleep.get('awakeSleepSeconds', 0))}}]},
-        "Resting HR": {"number": sleep_data.get('restingHeartRate', 0)}
-    }
+    template = get_payload_template(client, database_id, SLEEP_PROPERTIES)
+    values = build_sleep_values(sleep_data)
+    properties = template.fill(values)
     
     client.pages.create(parent={"database_id": database_id}, properties=properties, icon={"emoji": "😴"})
     print(f"Created sleep entry for: {sleep_date}")
+    return values  # The synced row, so the caller can export exactly what was written to Notion
+
+def update_sleep_data(client, database_id, existing_sleep, sleep_data):
+    """
+    Update an existing sleep entry if any of its values changed, e.g. a page created before the sleep-stage metrics
+    existed. Returns the synced row when the page was updated.
+    """
+    template = get_payload_template(client, database_id, SLEEP_PROPERTIES)
+    values = build_sleep_values(sleep_data)
+    if not template.needs_update(existing_sleep['properties'], values):
+        return None
+
+    client.pages.update(page_id=existing_sleep['id'], properties=template.fill(values))
+    print(f"Updated sleep entry for: {values['Long Date']}")
+    return values
+
+def sync_sleep_data(client, database_id, sleep_data):
+    """
+    Create the sleep entry for a night, or update the existing one. Returns the synced row, or None if nothing changed.
+    """
+    sleep_date = (sleep_data.get('dailySleepDTO') or {}).get('calendarDate')
+    if not sleep_date:
+        return None
+    existing_sleep = sleep_data_exists(client, database_id, sleep_date)
+    if existing_sleep:
+        return update_sleep_data(client, database_id, existing_sleep, sleep_data)
+    return create_sleep_data(client, database_id, sleep_data, skip_zero_sleep=True)
+
+def backfill_sleep_data(garmin, client, database_id, days, workers=4):
+    """
+    Sync the last `days` nights. Garmin has no range endpoint for detailed sleep, so nights are fetched on a bounded
+    worker pool; Notion writes stay sequential, paced and retried on rate limits.
+    """
+    today = datetime.today().date()
+    nights = [today - timedelta(days=x) for x in range(days)]
+    limiter = RateLimiter(DEFAULT_REQUESTS_PER_SECOND / 2)  # Up to two requests per night (lookup and write)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor, \
+            get_exporter("sleep", "Long Date", ("Long Date",)) as exporter:
+        futures = {executor.submit(get_sleep_data, garmin, night): night for night in nights}
+        for future in as_completed(futures):
+            night = futures[future]
+            try:
+                data = future.result()
+                if not data:
+                    continue
+                limiter.wait()
+                synced = retry_rate_limited(sync_sleep_data, client, database_id, data)
+            except Exception as e:
+                print(f"Error backfilling sleep for {night}: {e}")
+                continue
+            if synced:
+                exporter.append(synced)
 
 def main():
     load_dotenv()
@@ -89,15 +250,25 @@ def main():
     database_id = os.getenv("NOTION_SLEEP_DB_ID")
 
     # Initialize Garmin client and login
-    garmin = Garmin(garmin_email, garmin_password)
-    garmin.login()
+    garmin = garmin_auth.login(garmin_email, garmin_password)
     client = Client(auth=notion_token)
 
+    if len(sys.argv) > 1 and sys.argv[1] == "backfill":
+        backfill_sleep_data(
+            garmin,
+            client,
+            database_id,
+            days=int(os.getenv("GARMIN_SLEEP_BACKFILL_DAYS") or "365"),
+            workers=int(os.getenv("GARMIN_BACKFILL_WORKERS") or "4")
+        )
+        return
+
     data = get_sleep_data(garmin)
     if data:
-        sleep_date = data.get('dailySleepDTO', {}).get('calendarDate')
-        if sleep_date and not sleep_data_exists(client, database_id, sleep_date):
-            create_sleep_data(client, database_id, data, skip_zero_sleep=True)
+        synced = sync_sleep_data(client, database_id, data)
+        if synced:
+            with get_exporter("sleep", "Long Date", ("Long Date",)) as exporter:
+                exporter.append(synced)
 
 if __name__ == '__main__':
     main()
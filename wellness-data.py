@@ -0,0 +1,190 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from notion_client import Client
+from dotenv import load_dotenv
+import garth
+import os
+
+import garmin_auth
+from local_export import get_exporter
+from notion_schema import get_payload_template
+
+# Properties written to the wellness database, with their expected Notion types
+WELLNESS_PROPERTIES = {
+    "Day": "title",
+    "Date": "date",
+    "HRV (ms)": "number",
+    "HRV Status": "select",
+    "Body Battery High": "number",
+    "Body Battery Low": "number",
+    "Body Battery Charged": "number",
+    "Body Battery Drained": "number",
+    "Avg Stress": "number",
+    "Max Stress": "number",
+    "Resting HR": "number",
+    "Moderate Intensity (min)": "number",
+    "Vigorous Intensity (min)": "number",
+    "Intensity Minutes": "number"
+}
+
+def fetch_body_battery(garmin, start_date, end_date):
+    """
+    Body battery for the whole range in a single request, keyed by calendar date.
+    """
+    metrics = {}
+    for day in garmin.get_body_battery(start_date.isoformat(), end_date.isoformat()) or []:
+        levels = [entry[1] for entry in day.get('bodyBatteryValuesArray') or [] if entry[1] is not None]
+        metrics[day.get('date')] = {
+            "Body Battery High": max(levels) if levels else None,
+            "Body Battery Low": min(levels) if levels else None,
+            "Body Battery Charged": day.get('charged'),
+            "Body Battery Drained": day.get('drained')
+        }
+    return metrics
+
+def fetch_stress(garmin, start_date, end_date):
+    """
+    Average stress for the whole range from the daily stress range endpoint, keyed by calendar date.
+    """
+    days = (end_date - start_date).days + 1
+    return {
+        stats.calendar_date.isoformat(): {"Avg Stress": stats.overall_stress_level}
+        for stats in garth.DailyStress.list(end_date, days, client=garmin.garth)
+    }
+
+def fetch_intensity_minutes(garmin, start_date, end_date):
+    """
+    Moderate and vigorous intensity minutes for the whole range from the daily range endpoint, keyed by calendar date.
+    """
+    days = (end_date - start_date).days + 1
+    metrics = {}
+    for stats in garth.DailyIntensityMinutes.list(end_date, days, client=garmin.garth):
+        moderate = stats.moderate_value
+        vigorous = stats.vigorous_value
+        intensity_minutes = None
+        if moderate is not None or vigorous is not None:
+            # Garmin counts each vigorous minute twice towards the weekly intensity goal
+            intensity_minutes = (moderate or 0) + 2 * (vigorous or 0)
+        metrics[stats.calendar_date.isoformat()] = {
+            "Moderate Intensity (min)": moderate,
+            "Vigorous Intensity (min)": vigorous,
+            "Intensity Minutes": intensity_minutes
+        }
+    return metrics
+
+def fetch_hrv(garmin, start_date, end_date):
+    """
+    Overnight HRV for the whole range from the daily HRV range endpoint, keyed by calendar date.
+    """
+    days = (end_date - start_date).days + 1
+    return {
+        stats.calendar_date.isoformat(): {
+            "HRV (ms)": stats.last_night_avg,
+            "HRV Status": stats.status.replace('_', ' ').title() if stats.status else None
+        }
+        for stats in garth.DailyHRV.list(end_date, days, client=garmin.garth)
+    }
+
+def fetch_daily_summary(garmin, day):
+    """
+    Resting HR and max stress, which have no range endpoint and come from the per-day user summary.
+    """
+    summary = garmin.get_user_summary(day.isoformat()) or {}
+    return {
+        "Resting HR": summary.get('restingHeartRate'),
+        "Max Stress": summary.get('maxStressLevel')
+    }
+
+# One fetch plan covers every metric: range fetchers are called once for the whole date range,
+# daily fetchers are called once per day on a bounded worker pool.
+RANGE_FETCHERS = [fetch_body_battery, fetch_stress, fetch_intensity_minutes, fetch_hrv]
+DAILY_FETCHERS = [fetch_daily_summary]
+
+def get_wellness_rows(garmin, start_date, end_date, workers=4):
+    """
+    Run the fetch plan for [start_date, end_date] and merge every metric into a single row per day.
+    """
+    days = [start_date + timedelta(days=x) for x in range((end_date - start_date).days + 1)]
+    rows = {day.isoformat(): {"Day": day.isoformat(), "Date": day.isoformat()} for day in days}
+
+    for fetcher in RANGE_FETCHERS:
+        try:
+            range_metrics = fetcher(garmin, start_date, end_date)
+        except Exception as e:
+            print(f"Error fetching {fetcher.__name__} for {start_date} to {end_date}: {e}")
+            continue
+        for day, metrics in range_metrics.items():
+            if day in rows:
+                rows[day].update(metrics)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            (fetcher.__name__, day.isoformat()): executor.submit(fetcher, garmin, day)
+            for fetcher in DAILY_FETCHERS
+            for day in days
+        }
+        for (fetcher_name, day), future in futures.items():
+            try:
+                rows[day].update(future.result())
+            except Exception as e:
+                print(f"Error fetching {fetcher_name} for {day}: {e}")
+
+    return [rows[day.isoformat()] for day in days]
+
+def wellness_exists(client, database_id, wellness_date):
+    """
+    Check if a wellness entry already exists in the Notion database.
+    """
+    query = client.databases.query(
+        database_id=database_id,
+        filter={"property": "Date", "date": {"equals": wellness_date}}
+    )
+    results = query['results']
+    return results[0] if results else None
+
+def upsert_wellness(client, database_id, row):
+    """
+    Create the wellness entry for a day, or update it if any metric changed.
+    """
+    template = get_payload_template(client, database_id, WELLNESS_PROPERTIES)
+    existing = wellness_exists(client, database_id, row["Date"])
+    if existing:
+        if template.needs_update(existing['properties'], row):
+            client.pages.update(page_id=existing['id'], properties=template.fill(row))
+            print(f"Updated wellness entry for: {row['Date']}")
+    else:
+        client.pages.create(parent={"database_id": database_id}, properties=template.fill(row), icon={"emoji": "💚"})
+        print(f"Created wellness entry for: {row['Date']}")
+
+def main():
+    load_dotenv()
+
+    # Initialize Garmin and Notion clients using environment variables
+    garmin_email = os.getenv("GARMIN_EMAIL")
+    garmin_password = os.getenv("GARMIN_PASSWORD")
+    notion_token = os.getenv("NOTION_TOKEN")
+    database_id = os.getenv("NOTION_WELLNESS_DB_ID")
+    wellness_days = int(os.getenv("GARMIN_WELLNESS_DAYS") or "1")
+    workers = int(os.getenv("GARMIN_WELLNESS_WORKERS") or "4")
+
+    # The wellness database is optional, so the scheduled workflow can run this script unconfigured
+    if not database_id:
+        print("NOTION_WELLNESS_DB_ID is not set, skipping wellness sync")
+        return
+
+    # Initialize Garmin client and login
+    garmin = garmin_auth.login(garmin_email, garmin_password)
+    client = Client(auth=notion_token)
+
+    # Last x days, excl. today
+    end_date = date.today() - timedelta(days=1)
+    start_date = end_date - timedelta(days=wellness_days - 1)
+
+    rows = get_wellness_rows(garmin, start_date, end_date, workers)
+    with get_exporter("wellness", "Date", ("Date",)) as exporter:
+        for row in rows:
+            upsert_wellness(client, database_id, row)
+            exporter.append(row)
+
+if __name__ == '__main__':
+    main()